@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Apply Wave Planner
+Turns a `terraform graph` DOT export into waves of module targets that can be
+rolled out together, plus the critical path through the module dependencies
+"""
+
+import argparse
+import json
+import glob
+import os
+import re
+import shlex
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+DEFAULT_GRAPH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', 'environments', 'prod', 'infrastructure-clean.dot'
+)
+
+# Quoted DOT id, allowing escaped quotes: "module.app[\"a\"].aws_x.y"
+QUOTED_ID = r'"((?:[^"\\]|\\.)+)"'
+# "a" -> "b";  (a depends on b)
+EDGE_PATTERN = re.compile(r'^\s*' + QUOTED_ID + r'\s*->\s*' + QUOTED_ID)
+# "a" [label="..."];
+NODE_PATTERN = re.compile(r'^\s*' + QUOTED_ID + r'\s*\[')
+# module.a["k.1"].module.b.aws_x.y -> module.a["k.1"]; -target on the root
+# call already covers nested modules, so they are not planned separately
+MODULE_SEGMENT = r'module\.[^.\[\s]+(?:\[(?:"[^"]*"|[^\]"])*\])?'
+MODULE_PATTERN = re.compile(r'^' + MODULE_SEGMENT)
+# `terraform graph -type=plan` decorations: "[root] module.a.aws_x.y (expand)"
+ROOT_PREFIX = re.compile(r'^\[root\]\s+')
+NODE_SUFFIX = re.compile(r'\s+\((?:expand|close)\)$')
+# module "networking" {
+MODULE_BLOCK = re.compile(r'^\s*module\s+"([^"]+)"', re.MULTILINE)
+
+Group = Tuple[str, ...]
+
+
+def normalize_address(node_id: str) -> str:
+    """
+    Turn a DOT node id into a plain Terraform address
+    """
+    address = node_id.replace('\\"', '"')
+    address = ROOT_PREFIX.sub('', address)
+    return NODE_SUFFIX.sub('', address)
+
+
+def module_of(address: str) -> str:
+    """
+    Return the root module call owning an address, or '' for the root module
+    """
+    match = MODULE_PATTERN.match(address)
+    if not match:
+        return ''
+    return match.group(0)
+
+
+def parse_dot(text: str) -> Dict[str, Set[str]]:
+    """
+    Parse DOT text into an adjacency index: resource -> resources it depends on
+    """
+    graph: Dict[str, Set[str]] = {}
+
+    for line in text.splitlines():
+        edge = EDGE_PATTERN.match(line)
+        if edge:
+            source, target = (normalize_address(node_id) for node_id in edge.groups())
+            graph.setdefault(source, set()).add(target)
+            graph.setdefault(target, set())
+            continue
+
+        node = NODE_PATTERN.match(line)
+        if node:
+            graph.setdefault(normalize_address(node.group(1)), set())
+
+    return graph
+
+
+def module_graph(resource_graph: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    """
+    Collapse the resource graph into module -> modules it depends on
+
+    Root-module nodes (locals, root resources, providers) are walked through
+    rather than dropped, so module.a -> local.x -> module.b still orders a after b.
+    """
+    through_root: Dict[str, Set[str]] = {}
+
+    def modules_behind(node: str) -> Set[str]:
+        if node in through_root:
+            return through_root[node]
+        through_root[node] = set()
+        found: Set[str] = set()
+        for target in resource_graph.get(node, ()):
+            target_module = module_of(target)
+            found |= {target_module} if target_module else modules_behind(target)
+        through_root[node] = found
+        return found
+
+    modules: Dict[str, Set[str]] = {}
+
+    for source, targets in resource_graph.items():
+        source_module = module_of(source)
+        if not source_module:
+            continue
+        deps = modules.setdefault(source_module, set())
+        for target in targets:
+            target_module = module_of(target)
+            deps |= {target_module} if target_module else modules_behind(target)
+        deps.discard(source_module)
+
+    return modules
+
+
+def strongly_connected_components(graph: Dict[str, Set[str]]) -> List[List[str]]:
+    """
+    Return the strongly connected components of a graph (Tarjan), each sorted
+    """
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack: Set[str] = set()
+    components: List[List[str]] = []
+
+    def visit(node: str) -> None:
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+
+        for dep in sorted(graph.get(node, ())):
+            if dep not in index:
+                visit(dep)
+                lowlink[node] = min(lowlink[node], lowlink[dep])
+            elif dep in on_stack:
+                lowlink[node] = min(lowlink[node], index[dep])
+
+        if lowlink[node] == index[node]:
+            component: List[str] = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            components.append(sorted(component))
+
+    for node in sorted(graph):
+        if node not in index:
+            visit(node)
+
+    return components
+
+
+def condense(graph: Dict[str, Set[str]]) -> Dict[Group, Set[Group]]:
+    """
+    Merge modules that reference each other into groups applied together
+
+    Two modules may consume each other's outputs (compute reads the database
+    endpoint, database allows compute's security group) because the resource
+    graph stays acyclic. At module level that is a cycle, so such modules are
+    targeted as one group.
+    """
+    group_of: Dict[str, Group] = {}
+    for component in strongly_connected_components(graph):
+        for module in component:
+            group_of[module] = tuple(component)
+
+    condensed: Dict[Group, Set[Group]] = {group: set() for group in group_of.values()}
+    for module, deps in graph.items():
+        group = group_of[module]
+        condensed[group].update(group_of[dep] for dep in deps if group_of[dep] != group)
+
+    return condensed
+
+
+def compute_waves(graph: Dict) -> List[List]:
+    """
+    Group nodes into topologically ordered waves; every node only depends on earlier waves
+    """
+    remaining = {node: set(deps) for node, deps in graph.items()}
+    waves: List[List] = []
+
+    while remaining:
+        ready = sorted(node for node, deps in remaining.items() if not deps)
+        if not ready:
+            cycles = [
+                ', '.join(map(str, component))
+                for component in strongly_connected_components(remaining)
+                if len(component) > 1 or component[0] in remaining[component[0]]
+            ]
+            raise ValueError(f"Dependency cycle between: {'; '.join(cycles)}")
+
+        waves.append(ready)
+        for node in ready:
+            del remaining[node]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+    return waves
+
+
+def critical_path(graph: Dict, waves: List[List]) -> List:
+    """
+    Return the longest dependency chain, ordered from first to last applied
+    """
+    depth: Dict = {}
+    previous: Dict = {}
+
+    for wave in waves:
+        for node in wave:
+            depth[node] = 1
+            for dep in sorted(graph[node]):
+                if depth[dep] + 1 > depth[node]:
+                    depth[node] = depth[dep] + 1
+                    previous[node] = dep
+
+    if not depth:
+        return []
+
+    node = max(sorted(depth), key=lambda name: depth[name])
+    path = [node]
+    while node in previous:
+        node = previous[node]
+        path.append(node)
+
+    return list(reversed(path))
+
+
+def target_flags(modules: Group) -> str:
+    """
+    Render shell-quoted -target flags for a set of modules
+    """
+    return ' '.join(shlex.quote(f"-target={module}") for module in modules)
+
+
+def wave_commands(wave: List[Group]) -> Dict[str, List[str]]:
+    """
+    Build the commands for one wave
+
+    Plans are read-only and run in parallel with -lock=false, one per group.
+    Every target in a wave shares one state file, so the apply is a single
+    multi-target run and Terraform parallelises the resources itself instead
+    of the runs queueing on the DynamoDB state lock. Plans are not saved with
+    -out: once one target is applied the other saved plans would be stale.
+    """
+    plans = [f"terraform plan -lock=false {target_flags(group)}" for group in wave]
+    targets = target_flags(tuple(module for group in wave for module in group))
+
+    return {
+        'plan': plans,
+        'apply': [f"terraform apply {targets}"]
+    }
+
+
+def build_plan(text: str) -> Dict[str, object]:
+    """
+    Build the full rollout plan from DOT text
+    """
+    resources = parse_dot(text)
+    modules = module_graph(resources)
+    if not modules:
+        raise ValueError(f"No module resources found among {len(resources)} graph nodes")
+    groups = condense(modules)
+    waves = compute_waves(groups)
+
+    return {
+        'resources': len(resources),
+        'modules': len(modules),
+        'waves': [
+            {
+                'wave': index,
+                'targets': [module for group in wave for module in group],
+                'groups': [list(group) for group in wave],
+                'commands': wave_commands(wave)
+            }
+            for index, wave in enumerate(waves, start=1)
+        ],
+        'critical_path': [list(group) for group in critical_path(groups, waves)]
+    }
+
+
+def declared_modules(directory: str) -> Set[str]:
+    """
+    Return the root module names declared in the *.tf files of an environment
+    """
+    names: Set[str] = set()
+
+    for path in glob.glob(os.path.join(directory, '*.tf')):
+        with open(path) as handle:
+            names.update(MODULE_BLOCK.findall(handle.read()))
+
+    return names
+
+
+def missing_modules(plan: Dict[str, object], declared: Set[str]) -> List[str]:
+    """
+    Return declared root modules that never appear in the planned waves
+    """
+    planned = {
+        target.split('.')[1].split('[')[0]
+        for wave in plan['waves']
+        for target in wave['targets']
+    }
+    return sorted(declared - planned)
+
+
+def format_text(plan: Dict[str, object]) -> str:
+    """
+    Render the rollout plan as shell-friendly text
+    """
+    lines = [
+        f"# {plan['resources']} graph nodes in {plan['modules']} modules, "
+        f"{len(plan['waves'])} waves"
+    ]
+
+    for wave in plan['waves']:
+        lines.append('')
+        groups = [' + '.join(group) for group in wave['groups']]
+        lines.append(f"# Wave {wave['wave']}: {', '.join(groups)}")
+        lines.append('# plan (parallel)')
+        lines.extend(wave['commands']['plan'])
+        lines.append('# apply')
+        lines.extend(wave['commands']['apply'])
+
+    lines.append('')
+    path = [' + '.join(group) for group in plan['critical_path']]
+    lines.append(f"# Critical path: {' -> '.join(path)}")
+
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Plan parallel terraform apply waves from a dependency graph'
+    )
+    parser.add_argument('graph', nargs='?', default=DEFAULT_GRAPH,
+                        help='DOT file produced by `terraform graph`')
+    parser.add_argument('--json', action='store_true',
+                        help='print the plan as JSON')
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.graph) as handle:
+            text = handle.read()
+        plan = build_plan(text)
+        declared = declared_modules(os.path.dirname(os.path.abspath(args.graph)))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        return 1
+
+    for name in missing_modules(plan, declared):
+        print(f"WARNING: module.{name} is declared but missing from the graph; "
+              f"regenerate it with `terraform graph`", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    else:
+        print(format_text(plan))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
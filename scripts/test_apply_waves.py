@@ -0,0 +1,179 @@
+"""
+Offline tests for the apply wave planner, run against small inline DOT graphs
+"""
+
+import json
+
+import pytest
+
+import apply_waves
+
+
+def dot(*edges):
+    """
+    Build a DOT graph from (dependent, dependency) address pairs
+    """
+    lines = [f'  "{source}" -> "{target}";' for source, target in edges]
+    return '\n'.join(['digraph {', *lines, '}'])
+
+
+def plan_for(*edges):
+    return apply_waves.build_plan(dot(*edges))
+
+
+def test_parse_dot_builds_adjacency_index():
+    text = '\n'.join([
+        'digraph {',
+        '  "module.a.aws_x.lonely" [label="aws_x.lonely"];',
+        '  "module.a.aws_x.x" -> "module.b.aws_y.y";',
+        '}',
+    ])
+
+    assert apply_waves.parse_dot(text) == {
+        'module.a.aws_x.lonely': set(),
+        'module.a.aws_x.x': {'module.b.aws_y.y'},
+        'module.b.aws_y.y': set(),
+    }
+
+
+def test_plan_graph_addresses_are_normalized():
+    text = '\n'.join([
+        'digraph {',
+        '  "[root] module.compute.aws_lb.main (expand)" -> "[root] module.networking.aws_vpc.main (expand)"',
+        '  "[root] module.compute (close)" -> "[root] module.compute.aws_lb.main (expand)"',
+        '  "[root] module.app[\\"a.b\\"].aws_x.y (expand)" -> "[root] module.compute (close)"',
+        '}',
+    ])
+    modules = apply_waves.module_graph(apply_waves.parse_dot(text))
+
+    assert modules == {
+        'module.networking': set(),
+        'module.compute': {'module.networking'},
+        'module.app["a.b"]': {'module.compute'},
+    }
+
+
+def test_nested_modules_collapse_to_root_call():
+    modules = apply_waves.module_graph(apply_waves.parse_dot(dot(
+        ('module.a.module.inner.aws_x.x', 'module.b.aws_y.y'),
+        ('module.a.aws_z.z', 'module.a.module.inner.aws_x.x'),
+    )))
+
+    assert modules == {'module.a': {'module.b'}, 'module.b': set()}
+
+
+def test_dependencies_through_root_nodes_are_kept():
+    plan = plan_for(
+        ('module.a.aws_x.x', 'aws_y.root'),
+        ('aws_y.root', 'local.name'),
+        ('local.name', 'module.b.aws_z.z'),
+    )
+
+    assert [wave['targets'] for wave in plan['waves']] == [['module.b'], ['module.a']]
+
+
+def test_independent_modules_share_a_wave():
+    plan = plan_for(
+        ('module.compute.aws_lb.main', 'module.networking.aws_subnet.public'),
+        ('module.database.aws_db_instance.main', 'module.networking.aws_subnet.private'),
+        ('module.monitoring.aws_alarm.alb', 'module.compute.aws_lb.main'),
+    )
+
+    assert [wave['targets'] for wave in plan['waves']] == [
+        ['module.networking'],
+        ['module.compute', 'module.database'],
+        ['module.monitoring'],
+    ]
+    assert plan['critical_path'] == [
+        ['module.networking'], ['module.compute'], ['module.monitoring']
+    ]
+
+
+def test_mutually_referencing_modules_form_one_group():
+    plan = plan_for(
+        ('module.compute.aws_launch_template.app', 'module.database.aws_db_instance.main'),
+        ('module.database.aws_security_group.db', 'module.compute.aws_security_group.app'),
+        ('module.compute.aws_security_group.app', 'module.networking.aws_vpc.main'),
+        ('module.monitoring.aws_alarm.rds', 'module.database.aws_db_instance.main'),
+    )
+    group = ['module.compute', 'module.database']
+
+    assert [wave['groups'] for wave in plan['waves']] == [
+        [['module.networking']], [group], [['module.monitoring']]
+    ]
+    assert plan['waves'][1]['commands'] == {
+        'plan': ['terraform plan -lock=false -target=module.compute -target=module.database'],
+        'apply': ['terraform apply -target=module.compute -target=module.database'],
+    }
+    assert plan['critical_path'] == [['module.networking'], group, ['module.monitoring']]
+
+
+def test_compute_waves_reports_only_cycle_members():
+    graph = {
+        'module.a': {'module.b'},
+        'module.b': {'module.a'},
+        'module.c': {'module.a'},
+    }
+
+    with pytest.raises(ValueError, match=r'^Dependency cycle between: module\.a, module\.b$'):
+        apply_waves.compute_waves(graph)
+
+
+def test_graph_without_modules_returns_error(tmp_path, capsys):
+    graph = tmp_path / 'root.dot'
+    graph.write_text(dot(('aws_x.a', 'aws_x.b')))
+
+    assert apply_waves.main([str(graph)]) == 1
+    assert 'No module resources' in capsys.readouterr().err
+
+
+def test_missing_graph_returns_error(tmp_path, capsys):
+    assert apply_waves.main([str(tmp_path / 'missing.dot')]) == 1
+    assert capsys.readouterr().err.startswith('ERROR:')
+
+
+def test_declared_modules_missing_from_graph_warn(tmp_path, capsys):
+    (tmp_path / 'main.tf').write_text('module "a" {\n}\n\nmodule "b" {\n}\n')
+    graph = tmp_path / 'graph.dot'
+    graph.write_text(dot(('module.a.aws_x.x', 'aws_y.root')))
+
+    assert apply_waves.main([str(graph)]) == 0
+
+    err = capsys.readouterr().err
+    assert 'module.b is declared but missing' in err
+    assert 'module.a ' not in err
+
+
+def test_json_output(tmp_path, capsys):
+    graph = tmp_path / 'graph.dot'
+    graph.write_text(dot(
+        ('module.b.aws_x.x', 'module.a.aws_y.y'),
+        ('module.c.aws_z.z', 'module.a.aws_y.y'),
+    ))
+
+    assert apply_waves.main([str(graph), '--json']) == 0
+
+    plan = json.loads(capsys.readouterr().out)
+    assert plan['resources'] == 3
+    assert plan['modules'] == 3
+    assert plan['waves'][1] == {
+        'wave': 2,
+        'targets': ['module.b', 'module.c'],
+        'groups': [['module.b'], ['module.c']],
+        'commands': {
+            'plan': [
+                'terraform plan -lock=false -target=module.b',
+                'terraform plan -lock=false -target=module.c',
+            ],
+            'apply': ['terraform apply -target=module.b -target=module.c'],
+        },
+    }
+    assert plan['critical_path'] == [['module.a'], ['module.b']]
+
+
+def test_checked_in_graph_smoke(capsys):
+    assert apply_waves.main([]) == 0
+
+    out = capsys.readouterr().out
+    assert '# Wave 1:' in out
+    assert '-target=module.networking' in out